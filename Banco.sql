@@ -79,3 +79,67 @@ ADD FOREIGN KEY (client_id) REFERENCES clients(client_id) ON DELETE CASCADE;
 
 INSERT INTO clients (client_name, access_token) 
 VALUES ('magalu', 'a4ef17ab5b04447cc7f223b813fccef7bc52ab29e06b66a3');
+
+
+-- Rollups diários do dashboard (mantidos incrementalmente por analytics_rollup.py)
+CREATE TABLE `client_daily_stats` (
+    `stat_id` int(11) NOT NULL AUTO_INCREMENT,
+    `client_id` int(11) NOT NULL,
+    `day` date NOT NULL,
+    `conversations` int(11) NOT NULL DEFAULT 0,
+    `messages` int(11) NOT NULL DEFAULT 0,
+    `bot_responses` int(11) NOT NULL DEFAULT 0,
+    `fallbacks` int(11) NOT NULL DEFAULT 0,
+    PRIMARY KEY (`stat_id`),
+    UNIQUE KEY `uq_client_daily_stats` (`client_id`, `day`),
+    CONSTRAINT `client_daily_stats_client_fk` FOREIGN KEY (`client_id`) REFERENCES `clients` (`client_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- High-water mark de cada rollup (último ID já agregado)
+CREATE TABLE `rollup_state` (
+    `name` varchar(64) NOT NULL,
+    `last_id` int(11) NOT NULL DEFAULT 0,
+    `updated_at` datetime DEFAULT NULL,
+    PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Índices compostos para a paginação por cursor do dashboard
+CREATE INDEX idx_conversations_client_start ON conversations(client_id, start_time, conversation_id);
+CREATE INDEX idx_messages_conversation_ts ON messages(conversation_id, timestamp, message_id);
+
+-- Metadados da resposta do bot: intenção, método de match, score e latência
+ALTER TABLE `messages`
+ADD COLUMN `intent_id` int(11) NULL DEFAULT NULL AFTER `timestamp`,
+ADD COLUMN `intent_title` varchar(255) NULL DEFAULT NULL AFTER `intent_id`, -- chave estável (sem FK: o catálogo é recarregado)
+ADD COLUMN `match_method` varchar(16) NULL DEFAULT NULL AFTER `intent_title`, -- exact | signature | nlp | status | fallback
+ADD COLUMN `match_score` int(11) NULL DEFAULT NULL AFTER `match_method`,
+ADD COLUMN `latency_ms` int(11) NULL DEFAULT NULL AFTER `match_score`,
+ADD KEY `idx_messages_intent_id` (`intent_id`),
+ADD KEY `idx_messages_intent_title` (`intent_title`),
+ADD KEY `idx_messages_match_method` (`match_method`),
+ADD KEY `idx_messages_latency_ms` (`latency_ms`);
+
+-- Marca os fallbacks antigos (antes da coluna existir) para o dashboard continuar a encontrá-los
+UPDATE messages SET match_method = 'fallback'
+WHERE sender = 'bot' AND match_method IS NULL AND content = 'Desculpe, não tenho certeza de como ajudar.';
+
+-- Rollup diário de acionamentos por intenção
+CREATE TABLE `client_intent_daily_stats` (
+    `stat_id` int(11) NOT NULL AUTO_INCREMENT,
+    `client_id` int(11) NOT NULL,
+    `day` date NOT NULL,
+    `intent_title` varchar(255) NOT NULL,
+    `hits` int(11) NOT NULL DEFAULT 0,
+    PRIMARY KEY (`stat_id`),
+    UNIQUE KEY `uq_client_intent_daily_stats` (`client_id`, `day`, `intent_title`),
+    KEY `intent_title` (`intent_title`),
+    CONSTRAINT `client_intent_daily_stats_client_fk` FOREIGN KEY (`client_id`) REFERENCES `clients` (`client_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Assinaturas de erro (trechos literais do ERP/SEFAZ) para o caminho rápido do error_matcher.py
+CREATE TABLE intent_signatures (
+    signature_id INT AUTO_INCREMENT PRIMARY KEY,
+    intent_id INT,
+    signature TEXT NOT NULL,
+    FOREIGN KEY (intent_id) REFERENCES intents(intent_id) ON DELETE CASCADE
+);
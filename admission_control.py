@@ -0,0 +1,149 @@
+# File: admission_control.py
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+from fastapi import HTTPException
+from config import (
+    ADMISSION_GLOBAL_MAX_IN_FLIGHT, ADMISSION_CLIENT_RATE_PER_SECOND,
+    ADMISSION_CLIENT_BURST, ADMISSION_CLIENT_MAX_CONCURRENCY, ADMISSION_TOKEN_CACHE_TTL_SECONDS
+)
+
+
+class TokenBucket:
+    """Balde de tokens: permite rajadas de até `capacity` e reabastece `rate` tokens por segundo."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AdmissionController:
+    """
+    Controle de admissão do /chat, em três níveis:
+      1. limite global de requisições em andamento (503 imediato, antes de qualquer PLN/banco);
+      2. token bucket por cliente (429 quando a taxa é excedida);
+      3. limite de requisições simultâneas por cliente (429).
+    O estado fica em memória no processo: com vários workers do uvicorn, cada um aplica
+    os limites separadamente. Quando o token já está no cache token -> client_id, o limite
+    por cliente é verificado no event loop ANTES do global, então um cliente abusivo leva
+    seu 429 sem ocupar vagas globais; sem cache (primeira requisição ou TTL vencido), ele
+    é verificado na thread do pool, após a consulta do token. Como os dois lados mexem nos
+    contadores, todos são protegidos por um lock.
+    """
+
+    def __init__(self, global_max_in_flight: int, client_rate: float, client_burst: int, client_max_concurrency: int, token_cache_ttl: float):
+        self.global_max_in_flight = global_max_in_flight
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.client_max_concurrency = client_max_concurrency
+        self.token_cache_ttl = token_cache_ttl
+
+        self.in_flight = 0
+        self.global_rejected = 0
+        self.client_in_flight = defaultdict(int)
+        self.buckets = {}
+        self.stats = defaultdict(lambda: {"admitted": 0, "rejected_rate": 0, "rejected_concurrency": 0})
+        self.token_cache = {} # access_token -> (client_id, expira_em)
+        self.lock = threading.Lock()
+
+    def cached_client_id(self, token: str) -> Optional[int]:
+        """client_id do token, se ele foi validado no banco há menos de token_cache_ttl segundos."""
+        with self.lock:
+            entry = self.token_cache.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.token_cache[token]
+                return None
+            return entry[0]
+
+    def remember_client(self, token: str, client_id: int):
+        with self.lock:
+            self.token_cache[token] = (client_id, time.monotonic() + self.token_cache_ttl)
+
+    def forget_client(self, token: str):
+        with self.lock:
+            self.token_cache.pop(token, None)
+
+    def acquire_global(self):
+        with self.lock:
+            if self.in_flight >= self.global_max_in_flight:
+                self.global_rejected += 1
+                rejected = True
+            else:
+                self.in_flight += 1
+                rejected = False
+        if rejected:
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor sobrecarregado no momento. Tente novamente em instantes.",
+                headers={"Retry-After": "1"}
+            )
+
+    def release_global(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def acquire_client(self, client_id: int):
+        with self.lock:
+            self._acquire_client(client_id)
+
+    def _acquire_client(self, client_id: int):
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            bucket = self.buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+
+        if self.client_in_flight[client_id] >= self.client_max_concurrency:
+            self.stats[client_id]["rejected_concurrency"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas requisições simultâneas para esta empresa. Aguarde a resposta anterior.",
+                headers={"Retry-After": "1"}
+            )
+        if not bucket.try_acquire():
+            self.stats[client_id]["rejected_rate"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Limite de requisições excedido. Tente novamente em instantes.",
+                headers={"Retry-After": str(max(1, round(1 / self.client_rate)))}
+            )
+
+        self.client_in_flight[client_id] += 1
+        self.stats[client_id]["admitted"] += 1
+
+    def release_client(self, client_id: int):
+        with self.lock:
+            self.client_in_flight[client_id] -= 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "in_flight": self.in_flight,
+                "global_max_in_flight": self.global_max_in_flight,
+                "global_rejected": self.global_rejected,
+                "clients": {
+                    client_id: {**counters, "in_flight": self.client_in_flight[client_id]}
+                    for client_id, counters in self.stats.items()
+                },
+            }
+
+
+admission = AdmissionController(
+    global_max_in_flight=ADMISSION_GLOBAL_MAX_IN_FLIGHT,
+    client_rate=ADMISSION_CLIENT_RATE_PER_SECOND,
+    client_burst=ADMISSION_CLIENT_BURST,
+    client_max_concurrency=ADMISSION_CLIENT_MAX_CONCURRENCY,
+    token_cache_ttl=ADMISSION_TOKEN_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,168 @@
+# File: analytics_rollup.py
+# Mantém as tabelas de rollup diário usadas pelo dashboard.
+# Cada execução agrega apenas as linhas novas desde o último high-water mark,
+# então o custo depende do volume novo e não do tamanho total do histórico.
+#
+# Uso:
+#   python analytics_rollup.py                 -> processa o que houver de novo e sai
+#   python analytics_rollup.py --intervalo 60  -> roda em loop a cada 60 segundos
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal, Base, engine, Conversation, Message, ClientDailyStats, ClientIntentDailyStats, RollupState
+
+BATCH_SIZE = 5000
+# Mensagens mais novas que isso ficam para a próxima rodada, para não pular IDs
+# de transações que ainda não fizeram commit.
+SAFETY_LAG = timedelta(seconds=30)
+
+STATE_CONVERSATIONS = "client_daily_stats.conversations"
+STATE_MESSAGES = "client_daily_stats.messages"
+
+
+def get_state(db: Session, name: str) -> RollupState:
+    """
+    Lê o high-water mark com SELECT ... FOR UPDATE. O lock vale até o commit do lote,
+    então duas execuções simultâneas (loop + cron) nunca agregam o mesmo lote duas vezes:
+    a segunda espera e depois lê o high-water mark já avançado.
+    """
+    state = db.query(RollupState).filter(RollupState.name == name).with_for_update().first()
+    if not state:
+        try:
+            db.add(RollupState(name=name, last_id=0))
+            db.commit()
+        except IntegrityError: # outra execução criou a linha ao mesmo tempo
+            db.rollback()
+        state = db.query(RollupState).filter(RollupState.name == name).with_for_update().one()
+    return state
+
+
+def apply_increments(db: Session, increments: dict):
+    """Soma os contadores agregados em memória nas linhas (client_id, day) do rollup."""
+    for (client_id, day), counters in increments.items():
+        row = db.query(ClientDailyStats).filter(
+            ClientDailyStats.client_id == client_id, ClientDailyStats.day == day
+        ).with_for_update().first()
+        if not row:
+            row = ClientDailyStats(client_id=client_id, day=day, conversations=0, messages=0, bot_responses=0, fallbacks=0)
+            db.add(row)
+        for field, value in counters.items():
+            setattr(row, field, getattr(row, field) + value)
+
+
+def apply_intent_hits(db: Session, hits: dict):
+    """Soma os acertos por intenção nas linhas (client_id, day, intent_title) do rollup."""
+    for (client_id, day, intent_title), count in hits.items():
+        row = db.query(ClientIntentDailyStats).filter(
+            ClientIntentDailyStats.client_id == client_id,
+            ClientIntentDailyStats.day == day,
+            ClientIntentDailyStats.intent_title == intent_title
+        ).with_for_update().first()
+        if not row:
+            row = ClientIntentDailyStats(client_id=client_id, day=day, intent_title=intent_title, hits=0)
+            db.add(row)
+        row.hits += count
+
+
+def rollup_conversations(db: Session, cutoff: datetime) -> int:
+    """Agrega um lote de conversas novas. Retorna quantas linhas foram processadas."""
+    state = get_state(db, STATE_CONVERSATIONS)
+    rows = db.query(Conversation.conversation_id, Conversation.client_id, Conversation.start_time)\
+        .filter(Conversation.conversation_id > state.last_id, Conversation.start_time < cutoff)\
+        .order_by(Conversation.conversation_id.asc())\
+        .limit(BATCH_SIZE)\
+        .all()
+    if not rows:
+        return 0
+
+    increments = defaultdict(lambda: defaultdict(int))
+    for conversation_id, client_id, start_time in rows:
+        increments[(client_id, start_time.date())]["conversations"] += 1
+
+    apply_increments(db, increments)
+    state.last_id = rows[-1].conversation_id
+    db.commit()
+    return len(rows)
+
+
+def rollup_messages(db: Session, cutoff: datetime) -> int:
+    """Agrega um lote de mensagens novas. Retorna quantas linhas foram processadas."""
+    state = get_state(db, STATE_MESSAGES)
+    rows = db.query(Message.message_id, Message.sender, Message.match_method, Message.intent_title, Message.timestamp, Conversation.client_id)\
+        .outerjoin(Conversation, Message.conversation_id == Conversation.conversation_id)\
+        .filter(Message.message_id > state.last_id, Message.timestamp < cutoff)\
+        .order_by(Message.message_id.asc())\
+        .limit(BATCH_SIZE)\
+        .all()
+    if not rows:
+        return 0
+
+    increments = defaultdict(lambda: defaultdict(int))
+    intent_hits = defaultdict(int)
+    for message_id, sender, match_method, intent_title, timestamp, client_id in rows:
+        if client_id is None: # mensagem órfã, só avança o high-water mark
+            continue
+        counters = increments[(client_id, timestamp.date())]
+        counters["messages"] += 1
+        if sender == 'bot':
+            counters["bot_responses"] += 1
+            if match_method == 'fallback':
+                counters["fallbacks"] += 1
+            if intent_title is not None:
+                intent_hits[(client_id, timestamp.date(), intent_title)] += 1
+
+    apply_increments(db, increments)
+    apply_intent_hits(db, intent_hits)
+    state.last_id = rows[-1].message_id
+    db.commit()
+    return len(rows)
+
+
+def update_rollups(db: Session) -> dict:
+    """Processa todos os lotes pendentes e retorna o total de linhas agregadas por tabela."""
+    cutoff = datetime.now() - SAFETY_LAG
+    totals = {"conversations": 0, "messages": 0}
+    try:
+        while True:
+            processed = rollup_conversations(db, cutoff)
+            totals["conversations"] += processed
+            if processed < BATCH_SIZE:
+                break
+        while True:
+            processed = rollup_messages(db, cutoff)
+            totals["messages"] += processed
+            if processed < BATCH_SIZE:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza os rollups diários do dashboard.")
+    parser.add_argument("--intervalo", type=int, default=0, help="Segundos entre execuções (0 = executa uma vez).")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    while True:
+        db = SessionLocal()
+        try:
+            totals = update_rollups(db)
+            print(f"[Rollup] {totals['conversations']} conversas e {totals['messages']} mensagens agregadas.")
+        except Exception as e:
+            print(f"❌ Erro ao atualizar rollups: {e}")
+        finally:
+            db.close()
+
+        if args.intervalo <= 0:
+            break
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    main()
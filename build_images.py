@@ -0,0 +1,101 @@
+# File: build_images.py
+# Gera as variantes otimizadas das imagens usadas nas respostas do bot.
+#
+# Para cada arquivo em images/ são criados, em images/dist/:
+#   <nome>.<hash>.webp        -> versão completa em WebP (GIFs animados continuam animados)
+#   <nome>.<hash>.thumb.webp  -> miniatura exibida no balão do chat
+# O <hash> vem do conteúdo do arquivo original, então uma imagem alterada ganha um
+# nome novo e pode ser servida com cache "immutable" sem risco de ficar desatualizada.
+# O manifest.json mapeia o nome original para as variantes e é lido pelo image_service.py,
+# que o recarrega sozinho quando ele muda (não é preciso reiniciar a API).
+#
+# Uso: python build_images.py   (rode de novo sempre que adicionar/alterar imagens)
+import hashlib
+import json
+import os
+import sys
+from PIL import Image, ImageSequence
+from config import IMAGES_PATH, IMAGES_DIST_PATH, IMAGES_MANIFEST_PATH
+
+SOURCE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif"}
+WEBP_QUALITY = 80
+MAX_WIDTH = 1280
+THUMB_WIDTH = 360
+
+
+def content_hash(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def resized(frame: Image.Image, max_width: int) -> Image.Image:
+    if frame.width <= max_width:
+        return frame
+    height = round(frame.height * max_width / frame.width)
+    return frame.resize((max_width, height), Image.LANCZOS)
+
+
+def save_webp(image: Image.Image, target, max_width: int):
+    """Salva em WebP limitando a largura; imagens animadas mantêm todos os quadros."""
+    if getattr(image, "is_animated", False):
+        frames = [resized(frame.convert("RGBA"), max_width) for frame in ImageSequence.Iterator(image)]
+        durations = [frame.info.get("duration", 100) for frame in ImageSequence.Iterator(image)]
+        frames[0].save(
+            target, "WEBP", save_all=True, append_images=frames[1:],
+            duration=durations, loop=image.info.get("loop", 0), quality=WEBP_QUALITY, method=6
+        )
+    else:
+        resized(image.convert("RGBA"), max_width).save(target, "WEBP", quality=WEBP_QUALITY, method=6)
+
+
+def main():
+    if not IMAGES_PATH.is_dir():
+        print(f"❌ Pasta de imagens '{IMAGES_PATH}' não encontrada!")
+        sys.exit(1)
+    IMAGES_DIST_PATH.mkdir(parents=True, exist_ok=True)
+
+    manifest = {}
+    total_before = total_after = 0
+    for source in sorted(IMAGES_PATH.iterdir()):
+        if not source.is_file() or source.suffix.lower() not in SOURCE_EXTENSIONS:
+            continue
+
+        file_hash = content_hash(source)
+        full_name = f"{source.stem}.{file_hash}.webp"
+        thumb_name = f"{source.stem}.{file_hash}.thumb.webp"
+        full_path = IMAGES_DIST_PATH / full_name
+        thumb_path = IMAGES_DIST_PATH / thumb_name
+
+        if not (full_path.exists() and thumb_path.exists()):
+            with Image.open(source) as image:
+                save_webp(image, full_path, MAX_WIDTH)
+                save_webp(image, thumb_path, THUMB_WIDTH)
+            print(f"  🖼️  {source.name} → {full_name}")
+
+        manifest[source.name] = {"full": full_name, "thumb": thumb_name}
+        total_before += source.stat().st_size
+        total_after += full_path.stat().st_size
+
+    # Grava o manifest novo (em .tmp + os.replace, para a API nunca ler um JSON pela
+    # metade) antes de apagar qualquer variante: a API passa a usar os nomes novos
+    # na próxima requisição.
+    tmp_path = IMAGES_MANIFEST_PATH.with_name(IMAGES_MANIFEST_PATH.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, IMAGES_MANIFEST_PATH)
+
+    # Remove variantes antigas que não estão mais no manifest
+    current = {name for entry in manifest.values() for name in entry.values()}
+    for old in IMAGES_DIST_PATH.glob("*.webp"):
+        if old.name not in current:
+            old.unlink()
+
+    print(f"\n✅ {len(manifest)} imagens processadas: {total_before / 1024:.0f} KB → {total_after / 1024:.0f} KB (versões completas).")
+    print(f"📄 Manifest gravado em '{IMAGES_MANIFEST_PATH}'.")
+
+
+if __name__ == "__main__":
+    main()
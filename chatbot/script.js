@@ -25,7 +25,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Funções de UI (sem alterações) ---
-    function addMessage(sender, text, imageUrls = []) {
+    function addMessage(sender, text, imageUrls = [], thumbnailUrls = []) {
         const messageElement = document.createElement('div');
         messageElement.classList.add('message', `${sender}-message`);
         
@@ -41,13 +41,15 @@ document.addEventListener('DOMContentLoaded', () => {
         if (imageUrls && imageUrls.length > 0) {
             const imagesContainer = document.createElement('div');
             imagesContainer.classList.add('message-images');
-            imageUrls.forEach(url => {
+            imageUrls.forEach((url, index) => {
                 const imgElement = document.createElement('img');
-                imgElement.src = url;
+                // No balão mostramos a miniatura; a imagem completa só é baixada ao abrir o modal
+                imgElement.src = (thumbnailUrls && thumbnailUrls[index]) || url;
+                imgElement.loading = "lazy";
                 imgElement.alt = "Imagem da resposta do bot";
                 imgElement.onclick = function() {
                     modal.style.display = "flex";
-                    modalImg.src = this.src;
+                    modalImg.src = url;
                     modalCaption.textContent = this.alt;
                 }
                 imagesContainer.appendChild(imgElement);
@@ -163,7 +165,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const data = await response.json();
             // Adiciona a resposta do bot e em seguida renderiza os novos botões, se houver
-            addMessage('bot', data.response, data.images);
+            addMessage('bot', data.response, data.images, data.image_thumbnails);
             renderQuickReplies(data.quick_replies);
 
         } catch (error) {
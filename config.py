@@ -1,6 +1,40 @@
-
+import os
 from pathlib import Path
 
 
 # Configurar caminho das imagens
-IMAGES_PATH = Path("images")
+IMAGES_PATH = Path(__file__).resolve().parent / "images"
+# Variantes otimizadas geradas por build_images.py (WebP + miniaturas com hash no nome)
+IMAGES_DIST_PATH = IMAGES_PATH / "dist"
+IMAGES_MANIFEST_PATH = IMAGES_DIST_PATH / "manifest.json"
+
+# Endereço público da API, usado para montar as URLs das imagens nas respostas.
+# Em produção defina CHATBOT_PUBLIC_BASE_URL (ex: https://chat.suaempresa.com.br).
+PUBLIC_BASE_URL = os.getenv("CHATBOT_PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+
+# Resposta padrão do bot quando nenhuma intenção é encontrada.
+# Usada pelo chat, pelo job de rollups e pelo dashboard para identificar fallbacks.
+FALLBACK_RESPONSE = "Desculpe, não tenho certeza de como ajudar."
+
+# Limiar de confiança (0-100) para aceitar uma resposta do PLN.
+# Use replay_harness.py para medir o efeito de outros valores no tráfego real.
+CONFIDENCE_THRESHOLD = 60
+
+# Tamanho máximo (caracteres) da pergunta enviada ao PLN; o excedente é descartado.
+# Erros colados conhecidos são resolvidos antes pelo error_matcher.py, sem esse limite.
+NLP_MAX_QUESTION_CHARS = 300
+
+# Arquivamento de conversas antigas (message_archive.py)
+ARCHIVE_PATH = Path(__file__).resolve().parent / "archive"
+ARCHIVE_RETENTION_DAYS = 180
+
+# Token de administração para endpoints internos (ex: GET /chat/admission-stats),
+# enviado no cabeçalho X-Admin-Token. Sem a variável definida, esses endpoints ficam desativados.
+ADMIN_TOKEN = os.getenv("CHATBOT_ADMIN_TOKEN")
+
+# Controle de admissão do /chat (admission_control.py), por processo do uvicorn
+ADMISSION_GLOBAL_MAX_IN_FLIGHT = 64       # em execução + aguardando thread do pool (40 por padrão); acima disso, 503
+ADMISSION_CLIENT_RATE_PER_SECOND = 2      # reabastecimento do token bucket de cada cliente
+ADMISSION_CLIENT_BURST = 10               # rajada máxima por cliente
+ADMISSION_CLIENT_MAX_CONCURRENCY = 4      # requisições simultâneas por cliente
+ADMISSION_TOKEN_CACHE_TTL_SECONDS = 300   # cache token -> client_id usado para aplicar o limite por cliente no event loop
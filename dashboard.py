@@ -2,81 +2,171 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, case
-from database import SessionLocal, Client, Conversation, Message
+from sqlalchemy import func, case, or_, and_
+from database import SessionLocal, Client, Conversation, Message, ClientDailyStats, ClientIntentDailyStats
+from message_archive import get_archived_conversations
 from pathlib import Path
+from datetime import datetime, time, timedelta
 import html
 
 # --- Funções do Banco de Dados (Expandidas) ---
 def get_clients(db: Session):
     return db.query(Client).order_by(Client.client_name).all()
 
-def get_conversations(db: Session, client_id: int):
-    return db.query(Conversation).filter(Conversation.client_id == client_id).order_by(Conversation.start_time.desc()).all()
+# Paginação por cursor (keyset): em vez de OFFSET, cada página começa logo após a
+# última linha da página anterior, usando os índices compostos das tabelas.
+CONVERSATIONS_PAGE_SIZE = 25
+MESSAGES_PAGE_SIZE = 50
+MAX_LOADED_MESSAGES = 1000
+ARCHIVED_CONVERSATIONS_LIMIT = 100
 
-def get_messages(db: Session, conversation_id: int):
-    return db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.timestamp.asc()).all()
+def get_conversations_page(db: Session, client_id: int, cursor=None, date_from=None, date_to=None, text=None, limit: int = CONVERSATIONS_PAGE_SIZE):
+    """
+    Retorna até `limit` conversas do cliente, da mais recente para a mais antiga.
+    `cursor` é o par (start_time, conversation_id) da última conversa da página anterior.
+    """
+    query = db.query(Conversation).filter(Conversation.client_id == client_id)
+    if date_from:
+        query = query.filter(Conversation.start_time >= datetime.combine(date_from, time.min))
+    if date_to:
+        query = query.filter(Conversation.start_time < datetime.combine(date_to + timedelta(days=1), time.min))
+    if text:
+        query = query.filter(
+            db.query(Message.message_id)
+            .filter(Message.conversation_id == Conversation.conversation_id, Message.content.contains(text, autoescape=True))
+            .exists()
+        )
+    if cursor:
+        last_start_time, last_id = cursor
+        query = query.filter(or_(
+            Conversation.start_time < last_start_time,
+            and_(Conversation.start_time == last_start_time, Conversation.conversation_id < last_id)
+        ))
+    return query.order_by(Conversation.start_time.desc(), Conversation.conversation_id.desc()).limit(limit).all()
+
+def get_messages_page(db: Session, conversation_id: int, cursor=None, limit: int = MESSAGES_PAGE_SIZE):
+    """
+    Retorna até `limit` mensagens da conversa em ordem cronológica.
+    `cursor` é o par (timestamp, message_id) da última mensagem já carregada.
+    """
+    query = db.query(Message).filter(Message.conversation_id == conversation_id)
+    if cursor:
+        last_timestamp, last_id = cursor
+        query = query.filter(or_(
+            Message.timestamp > last_timestamp,
+            and_(Message.timestamp == last_timestamp, Message.message_id > last_id)
+        ))
+    return query.order_by(Message.timestamp.asc(), Message.message_id.asc()).limit(limit).all()
+
+def get_conversation_metrics(db: Session, conversation_id: int):
+    """Agrega as métricas da conversa no banco, sem carregar as mensagens."""
+    total, user_count, first_ts, last_ts = db.query(
+        func.count(Message.message_id),
+        func.sum(case((Message.sender == 'user', 1), else_=0)),
+        func.min(Message.timestamp),
+        func.max(Message.timestamp)
+    ).filter(Message.conversation_id == conversation_id).one()
+    return {
+        "total": total or 0,
+        "user": int(user_count or 0),
+        "first": first_ts,
+        "last": last_ts,
+    }
 
 # --- NOVAS FUNÇÕES DE ANÁLISE ---
-def get_unanswered_questions(db: Session):
-    """Busca perguntas de usuários que o bot não soube responder."""
-    # Encontra IDs de conversas onde o bot disse a frase padrão de "não sei"
-    fallback_response = "Desculpe, não tenho certeza de como ajudar. Pode reformular?"
-    
-    # Subquery para pegar a mensagem do usuário que veio ANTES da resposta de fallback do bot
-    # Esta query é um pouco mais complexa e usa funções do SQL para encontrar a mensagem anterior.
-    
-    # Primeiro, pegamos todas as mensagens de fallback do bot
-    fallback_messages = db.query(Message).filter(Message.content == fallback_response, Message.sender == 'bot').all()
+def get_unanswered_questions(db: Session, limit: int = 200):
+    """Busca as perguntas mais recentes que o bot não soube responder."""
+    # As respostas de fallback são marcadas em messages.match_method (coluna indexada),
+    # então não é preciso comparar o texto de todas as mensagens.
+    fallback_messages = db.query(Message.conversation_id, Message.message_id, Message.timestamp)\
+        .filter(Message.match_method == 'fallback')\
+        .order_by(Message.message_id.desc())\
+        .limit(limit)\
+        .all()
     
     unanswered_data = []
-    for bot_msg in fallback_messages:
+    for conversation_id, bot_message_id, bot_timestamp in fallback_messages:
         # Para cada mensagem de fallback, encontramos a mensagem do usuário que veio logo antes na mesma conversa
-        user_msg = db.query(Message)\
-            .filter(Message.conversation_id == bot_msg.conversation_id, Message.timestamp < bot_msg.timestamp, Message.sender == 'user')\
-            .order_by(Message.timestamp.desc())\
+        row = db.query(Message.content, Message.timestamp, Client.client_name)\
+            .join(Conversation, Message.conversation_id == Conversation.conversation_id)\
+            .join(Client, Conversation.client_id == Client.client_id)\
+            .filter(Message.conversation_id == conversation_id, Message.message_id < bot_message_id, Message.sender == 'user')\
+            .order_by(Message.message_id.desc())\
             .first()
         
-        if user_msg:
-            client_convo = db.query(Conversation).filter(Conversation.conversation_id == user_msg.conversation_id).first()
-            client = db.query(Client).filter(Client.client_id == client_convo.client_id).first()
+        if row:
+            content, timestamp, client_name = row
             unanswered_data.append({
-                "Data": user_msg.timestamp.strftime('%d/%m/%Y'),
-                "Cliente": client.client_name,
-                "Pergunta Não Respondida": user_msg.content
+                "Data": timestamp.strftime('%d/%m/%Y'),
+                "Cliente": client_name,
+                "Pergunta Não Respondida": content
             })
             
     return pd.DataFrame(unanswered_data)
 
 
+def get_intent_traffic(db: Session, limit: int = 20):
+    """Intenções mais acionadas, a partir do rollup diário por intenção."""
+    results = db.query(
+        ClientIntentDailyStats.intent_title,
+        func.sum(ClientIntentDailyStats.hits).label('hits')
+    ).group_by(ClientIntentDailyStats.intent_title)\
+    .order_by(func.sum(ClientIntentDailyStats.hits).desc())\
+    .limit(limit)\
+    .all()
+    return pd.DataFrame([{"Intenção": title, "Acionamentos": int(hits or 0)} for title, hits in results])
+
+
+def get_slow_answers(db: Session, limit: int = 20):
+    """Respostas do bot mais lentas (latência medida no servidor)."""
+    results = db.query(Message.timestamp, Message.latency_ms, Message.match_method, Message.intent_title)\
+        .filter(Message.latency_ms.isnot(None))\
+        .order_by(Message.latency_ms.desc())\
+        .limit(limit)\
+        .all()
+    return pd.DataFrame([
+        {
+            "Data": timestamp.strftime('%d/%m/%Y %H:%M:%S'),
+            "Latência (ms)": latency_ms,
+            "Método": match_method,
+            "Intenção": title or "-",
+        }
+        for timestamp, latency_ms, match_method, title in results
+    ])
+
+
 def get_client_engagement(db: Session):
-    """Calcula o engajamento e a assertividade por cliente."""
-    fallback_response = "Desculpe, não tenho certeza de como ajudar. Pode reformular?"
+    """Calcula o engajamento e a assertividade por cliente a partir dos rollups diários."""
+    # Lê apenas client_daily_stats (mantida por analytics_rollup.py), então o tempo
+    # de carga não depende do tamanho da tabela de mensagens.
+    stats = db.query(
+        ClientDailyStats.client_id.label('client_id'),
+        func.sum(ClientDailyStats.conversations).label('total_conversations'),
+        func.sum(ClientDailyStats.messages).label('total_messages'),
+        func.sum(ClientDailyStats.bot_responses).label('bot_responses'),
+        func.sum(ClientDailyStats.fallbacks).label('fallback_count')
+    ).group_by(ClientDailyStats.client_id).subquery()
 
-    # Usamos func.count e func.sum do SQLAlchemy para agregar os dados
     results = db.query(
         Client.client_name,
-        func.count(Conversation.conversation_id).label('total_conversations'),
-        func.count(Message.message_id).label('total_messages'),
-        func.sum(case((Message.sender == 'bot', 1), else_=0)).label('bot_responses'),
-        func.sum(case((Message.content == fallback_response, 1), else_=0)).label('fallback_count')
-    ).select_from(Client)\
-    .outerjoin(Conversation, Client.client_id == Conversation.client_id)\
-    .outerjoin(Message, Conversation.conversation_id == Message.conversation_id)\
-    .group_by(Client.client_name)\
-    .order_by(func.count(Conversation.conversation_id).desc())\
+        stats.c.total_conversations,
+        stats.c.total_messages,
+        stats.c.bot_responses,
+        stats.c.fallback_count
+    ).outerjoin(stats, Client.client_id == stats.c.client_id)\
+    .order_by(func.coalesce(stats.c.total_conversations, 0).desc())\
     .all()
 
     engagement_data = []
     for name, convos, msgs, bot_res, fallbacks in results:
-        bot_res = bot_res or 0
-        fallbacks = fallbacks or 0
+        bot_res = int(bot_res or 0)
+        fallbacks = int(fallbacks or 0)
         # Evita divisão por zero se o bot não respondeu
         assertividade = ((bot_res - fallbacks) / bot_res * 100) if bot_res > 0 else 0
         engagement_data.append({
             "Cliente": name,
-            "Total de Conversas": convos,
-            "Total de Mensagens": msgs,
+            "Total de Conversas": int(convos or 0),
+            "Total de Mensagens": int(msgs or 0),
             "Assertividade do Bot (%)": f"{assertividade:.1f}"
         })
 
@@ -108,6 +198,7 @@ try:
 
     with col1_geral:
         st.subheader("Engajamento por Cliente")
+        st.caption("Dados dos rollups diários (atualizados por `python analytics_rollup.py`).")
         df_engagement = get_client_engagement(db)
         st.dataframe(df_engagement, use_container_width=True)
 
@@ -128,6 +219,16 @@ try:
             }
         )
     
+    col3_geral, col4_geral = st.columns(2)
+
+    with col3_geral:
+        st.subheader("Intenções Mais Acionadas")
+        st.dataframe(get_intent_traffic(db), use_container_width=True, hide_index=True)
+
+    with col4_geral:
+        st.subheader("Respostas Mais Lentas")
+        st.dataframe(get_slow_answers(db), use_container_width=True, hide_index=True)
+
     # --- Seção de Visualização de Conversa Individual ---
     st.markdown("---")
     st.header("Análise de Conversa Individual")
@@ -144,10 +245,78 @@ try:
     )
 
     selected_client_id = client_options[selected_client_name]
-    client_conversations = get_conversations(db, selected_client_id)
+
+    col_de, col_ate, col_texto = st.columns([1, 1, 2])
+    with col_de:
+        filter_date_from = st.date_input("De", value=None, format="DD/MM/YYYY")
+    with col_ate:
+        filter_date_to = st.date_input("Até", value=None, format="DD/MM/YYYY")
+    with col_texto:
+        filter_text = st.text_input("Buscar texto nas mensagens").strip()
+
+    # --- Histórico arquivado (conversas movidas para disco por message_archive.py) ---
+    if st.toggle("Consultar histórico arquivado"):
+        archived_conversations = get_archived_conversations(
+            selected_client_id, date_from=filter_date_from, date_to=filter_date_to,
+            text=filter_text or None, limit=ARCHIVED_CONVERSATIONS_LIMIT
+        )
+        if not archived_conversations:
+            st.info(f"Nenhuma conversa arquivada encontrada para o cliente '{selected_client_name}' com os filtros atuais.")
+            st.stop()
+        if len(archived_conversations) == ARCHIVED_CONVERSATIONS_LIMIT:
+            st.caption(f"Mostrando as {ARCHIVED_CONVERSATIONS_LIMIT} conversas mais recentes; use os filtros para refinar.")
+
+        archived_options = {
+            f"Conversa #{conv['conversation_id']}  |  {datetime.fromisoformat(conv['start_time']).strftime('%d/%m/%Y às %H:%M:%S')}": conv
+            for conv in archived_conversations
+        }
+        selected_archived = archived_options[st.selectbox(
+            "**2. Selecione uma Conversa Arquivada**",
+            options=list(archived_options.keys())
+        )]
+
+        st.subheader(f"Diálogo da Conversa #{selected_archived['conversation_id']} (arquivada)")
+        with st.container(height=600):
+            for msg in selected_archived["messages"]:
+                with st.chat_message(name=msg["sender"], avatar="🤖" if msg["sender"] == 'bot' else "🧑‍💻"):
+                    st.markdown(msg["content"])
+                    if msg["timestamp"]:
+                        st.caption(f"_{datetime.fromisoformat(msg['timestamp']).strftime('%d/%m/%Y %H:%M:%S')}_")
+        st.stop()
+
+    # A pilha de cursores guarda o início de cada página visitada e é reiniciada
+    # sempre que o cliente ou os filtros mudam.
+    filter_key = (selected_client_id, filter_date_from, filter_date_to, filter_text)
+    if st.session_state.get("conv_filter_key") != filter_key:
+        st.session_state["conv_filter_key"] = filter_key
+        st.session_state["conv_cursors"] = [None]
+    conv_cursors = st.session_state["conv_cursors"]
+
+    client_conversations = get_conversations_page(
+        db, selected_client_id, cursor=conv_cursors[-1],
+        date_from=filter_date_from, date_to=filter_date_to, text=filter_text or None
+    )
+
+    if not client_conversations:
+        if len(conv_cursors) == 1:
+            st.info(f"Nenhuma conversa encontrada para o cliente '{selected_client_name}' com os filtros atuais.")
+            st.stop()
+        st.info("Não há mais conversas.")
+
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("◀ Mais recentes", disabled=len(conv_cursors) == 1):
+            conv_cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Página {len(conv_cursors)}")
+    with col_next:
+        if st.button("Mais antigas ▶", disabled=len(client_conversations) < CONVERSATIONS_PAGE_SIZE):
+            last_conv = client_conversations[-1]
+            conv_cursors.append((last_conv.start_time, last_conv.conversation_id))
+            st.rerun()
 
     if not client_conversations:
-        st.info(f"O cliente '{selected_client_name}' ainda não possui conversas registradas.")
         st.stop()
 
     conversation_options = {
@@ -160,18 +329,39 @@ try:
     )
     
     selected_conversation_id = conversation_options[selected_conversation_label]
-    messages = get_messages(db, selected_conversation_id)
+
+    # Mensagens carregadas sob demanda: guardamos só dicts simples na sessão,
+    # limitados a MAX_LOADED_MESSAGES por conversa.
+    if st.session_state.get("msg_conversation_id") != selected_conversation_id:
+        st.session_state["msg_conversation_id"] = selected_conversation_id
+        st.session_state["msg_loaded"] = []
+        st.session_state["msg_has_more"] = True
+    loaded_messages = st.session_state["msg_loaded"]
+
+    def load_next_messages_page():
+        cursor = (loaded_messages[-1]["timestamp"], loaded_messages[-1]["message_id"]) if loaded_messages else None
+        page = get_messages_page(db, selected_conversation_id, cursor=cursor)
+        loaded_messages.extend(
+            {"message_id": m.message_id, "sender": m.sender, "content": m.content, "timestamp": m.timestamp}
+            for m in page
+        )
+        st.session_state["msg_has_more"] = len(page) == MESSAGES_PAGE_SIZE
+
+    if not loaded_messages and st.session_state["msg_has_more"]:
+        load_next_messages_page()
+
+    metrics = get_conversation_metrics(db, selected_conversation_id)
 
     col1_convo, col2_convo = st.columns([1, 2])
 
     with col1_convo:
         st.subheader("Métricas da Conversa")
-        total_messages = len(messages)
-        user_messages_count = sum(1 for msg in messages if msg.sender == 'user')
+        total_messages = metrics["total"]
+        user_messages_count = metrics["user"]
         bot_messages_count = total_messages - user_messages_count
         
         if total_messages > 1:
-            duration = messages[-1].timestamp - messages[0].timestamp
+            duration = metrics["last"] - metrics["first"]
             st.metric(label="Duração da Conversa", value=str(duration).split('.')[0])
         else:
             st.metric(label="Duração da Conversa", value="N/A")
@@ -183,10 +373,18 @@ try:
     with col2_convo:
         st.subheader(f"Diálogo da Conversa #{selected_conversation_id}")
         with st.container(height=600):
-            for msg in messages:
-                with st.chat_message(name=msg.sender, avatar="🤖" if msg.sender == 'bot' else "🧑‍💻"):
-                    st.markdown(msg.content)
-                    st.caption(f"_{msg.timestamp.strftime('%d/%m/%Y %H:%M:%S')}_")
+            for msg in loaded_messages:
+                with st.chat_message(name=msg["sender"], avatar="🤖" if msg["sender"] == 'bot' else "🧑‍💻"):
+                    st.markdown(msg["content"])
+                    st.caption(f"_{msg['timestamp'].strftime('%d/%m/%Y %H:%M:%S')}_")
+
+        st.caption(f"{len(loaded_messages)} de {total_messages} mensagens carregadas.")
+        if st.session_state["msg_has_more"]:
+            if len(loaded_messages) >= MAX_LOADED_MESSAGES:
+                st.warning(f"Limite de {MAX_LOADED_MESSAGES} mensagens carregadas atingido.")
+            elif st.button("Carregar mais mensagens"):
+                load_next_messages_page()
+                st.rerun()
 
 finally:
     db.close()
\ No newline at end of file
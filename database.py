@@ -1,5 +1,5 @@
 # File: database.py (Versão Corrigida para refletir seu banco de dados)
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Date, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -26,6 +26,7 @@ class Client(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (Index("idx_conversations_client_start", "client_id", "start_time", "conversation_id"),)
     conversation_id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.client_id", ondelete="CASCADE"), nullable=False)
     start_time = Column(DateTime, server_default=func.now())
@@ -40,11 +41,20 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("idx_messages_conversation_ts", "conversation_id", "timestamp", "message_id"),)
     message_id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.conversation_id", ondelete="CASCADE"))
     sender = Column(String(50), nullable=False)
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, server_default=func.now())
+    # Metadados da resposta do bot (NULL nas mensagens do usuário)
+    # Sem FK para intents: o catálogo é recarregado pelo migrate_intents.py (IDs mudam),
+    # e o histórico não pode perder a referência. O título é a chave estável das análises.
+    intent_id = Column(Integer, nullable=True, index=True)
+    intent_title = Column(String(255), nullable=True, index=True)
+    match_method = Column(String(16), nullable=True, index=True) # exact | signature | nlp | status | fallback
+    match_score = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True, index=True)
     conversation = relationship("Conversation", back_populates="messages")
     
 class Intent(Base):
@@ -53,6 +63,7 @@ class Intent(Base):
     title = Column(String(255), nullable=False)
     response = Column(Text, nullable=False) # <<< ÚNICA COLUNA DE RESPOSTA, COMO NO SEU BANCO
     variations = relationship("IntentVariation", back_populates="intent", cascade="all, delete-orphan")
+    signatures = relationship("IntentSignature", back_populates="intent", cascade="all, delete-orphan")
 
 class IntentVariation(Base):
     __tablename__ = "intent_variations"
@@ -61,6 +72,43 @@ class IntentVariation(Base):
     variation = Column(Text, nullable=False)
     intent = relationship("Intent", back_populates="variations")
 
+class IntentSignature(Base):
+    # Trechos literais de mensagens de erro do ERP/SEFAZ (chave "signatures" nos JSON),
+    # usados pelo caminho rápido do error_matcher.py
+    __tablename__ = "intent_signatures"
+    signature_id = Column(Integer, primary_key=True, index=True)
+    intent_id = Column(Integer, ForeignKey("intents.intent_id", ondelete="CASCADE"))
+    signature = Column(Text, nullable=False)
+    intent = relationship("Intent", back_populates="signatures")
+
+# --- Tabelas de rollup do dashboard (mantidas por analytics_rollup.py) ---
+
+class ClientDailyStats(Base):
+    __tablename__ = "client_daily_stats"
+    __table_args__ = (UniqueConstraint("client_id", "day", name="uq_client_daily_stats"),)
+    stat_id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.client_id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    conversations = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+    bot_responses = Column(Integer, nullable=False, default=0)
+    fallbacks = Column(Integer, nullable=False, default=0)
+
+class ClientIntentDailyStats(Base):
+    __tablename__ = "client_intent_daily_stats"
+    __table_args__ = (UniqueConstraint("client_id", "day", "intent_title", name="uq_client_intent_daily_stats"),)
+    stat_id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.client_id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    intent_title = Column(String(255), nullable=False, index=True) # sem FK: sobrevive à recarga do catálogo
+    hits = Column(Integer, nullable=False, default=0)
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+    name = Column(String(64), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0) # high-water mark: último ID já agregado
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # --- Função para obter a sessão do DB ---
 
 def get_db():
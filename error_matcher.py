@@ -0,0 +1,137 @@
+# File: error_matcher.py
+# Caminho rápido para mensagens de erro coladas do ERP (Ctrl+V).
+#
+# Textos de erro são longos e caros para o spaCy/fuzzywuzzy, mas trazem trechos
+# literais bem característicos ("Rejeição: Duplicidade de NF-e", "nao esta autorizado
+# a ALTERAR registros"). Esses trechos ficam listados explicitamente na chave
+# "signatures" de cada intenção (tabela intent_signatures) e são compilados em um
+# autômato Aho-Corasick, que procura todos de uma vez em tempo linear no tamanho
+# da pergunta. As variações ("patterns") não entram: paráfrases como "erro no valor
+# do produto" continuam passando pelo PLN e pelo limiar de confiança.
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from database import Intent, IntentSignature
+
+# O autômato é recompilado a cada ERROR_MATCHER_TTL_SECONDS, para refletir
+# recargas do catálogo feitas pelo migrate_intents.py em outro processo.
+ERROR_MATCHER_TTL_SECONDS = 300
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados ("Rejeição:  X" -> "rejeicao: x")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.split())
+
+
+class AhoCorasick:
+    """Autômato Aho-Corasick simples (dicts por nó) para busca de vários padrões ao mesmo tempo."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, Hashable]]] = [[]] # (tamanho do padrão, valor)
+
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = next_node
+                node = next_node
+            self.output[node].append((len(pattern), value))
+
+        # Links de falha em largura: cada nó herda as saídas do seu link de falha
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def search(self, text: str) -> List[Tuple[int, int, Hashable]]:
+        """Retorna (posição final, tamanho do padrão, valor) de todas as ocorrências no texto."""
+        matches = []
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, value in self.output[node]:
+                matches.append((end, length, value))
+        return matches
+
+
+def is_word_bounded(text: str, start: int, end: int) -> bool:
+    """
+    Verdadeiro se a ocorrência text[start:end + 1] não está colada em outra palavra.
+    Só vale para bordas alfanuméricas: "nfe}IE'" termina em aspas e não precisa de fronteira.
+    """
+    if text[start].isalnum() and start > 0 and text[start - 1].isalnum():
+        return False
+    if text[end].isalnum() and end + 1 < len(text) and text[end + 1].isalnum():
+        return False
+    return True
+
+
+class ErrorSignatureMatcher:
+    """Mapeia assinaturas de erro (chave, trecho literal) para a chave da intenção (ID, título, etc.)."""
+
+    def __init__(self, signatures: Iterable[Tuple[Hashable, str]]):
+        normalized = {}
+        for key, signature in signatures:
+            text = normalize_text(signature)
+            if text:
+                normalized.setdefault(text, key)
+        self.size = len(normalized)
+        self.automaton = AhoCorasick((text, key) for text, key in normalized.items())
+
+    def match(self, question: str) -> Optional[Hashable]:
+        """Retorna a chave da assinatura mais longa encontrada (com fronteira de palavra), ou None."""
+        if not self.size or not question:
+            return None
+        text = normalize_text(question)
+        matches = [
+            (length, value) for end, length, value in self.automaton.search(text)
+            if is_word_bounded(text, end - length + 1, end)
+        ]
+        if not matches:
+            return None
+        return max(matches, key=lambda m: m[0])[1]
+
+
+# Matcher global com TTL; o lock evita compilações simultâneas pelas threads do /chat.
+ERROR_MATCHER = None
+ERROR_MATCHER_BUILT_AT = 0.0
+ERROR_MATCHER_LOCK = threading.Lock()
+
+def get_error_matcher(db: Session) -> ErrorSignatureMatcher:
+    global ERROR_MATCHER, ERROR_MATCHER_BUILT_AT
+    if ERROR_MATCHER is not None and time.monotonic() - ERROR_MATCHER_BUILT_AT < ERROR_MATCHER_TTL_SECONDS:
+        return ERROR_MATCHER
+    with ERROR_MATCHER_LOCK:
+        if ERROR_MATCHER is None or time.monotonic() - ERROR_MATCHER_BUILT_AT >= ERROR_MATCHER_TTL_SECONDS:
+            rows = db.query(IntentSignature.intent_id, IntentSignature.signature).all()
+            ERROR_MATCHER = ErrorSignatureMatcher((intent_id, signature) for intent_id, signature in rows)
+            ERROR_MATCHER_BUILT_AT = time.monotonic()
+            print(f"[Error Matcher] Autômato compilado com {ERROR_MATCHER.size} assinaturas de erro.")
+    return ERROR_MATCHER
+
+def find_error_signature_intent(db: Session, question: str) -> Optional[Intent]:
+    """Procura uma assinatura de erro conhecida na pergunta e retorna a intenção correspondente."""
+    intent_id = get_error_matcher(db).match(question)
+    if intent_id is None:
+        return None
+    return db.query(Intent).filter(Intent.intent_id == intent_id).first()
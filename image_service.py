@@ -0,0 +1,60 @@
+# File: image_service.py
+import json
+import threading
+from typing import List, Tuple
+from config import IMAGES_MANIFEST_PATH, PUBLIC_BASE_URL
+
+# Manifest das variantes otimizadas (gerado por build_images.py). É recarregado quando
+# o mtime do arquivo muda, porque o build apaga as variantes antigas: com o manifest
+# antigo em memória, a API continuaria gerando URLs de arquivos que não existem mais.
+IMAGES_MANIFEST = None
+IMAGES_MANIFEST_MTIME = None
+IMAGES_MANIFEST_LOCK = threading.Lock()
+
+def get_images_manifest() -> dict:
+    """
+    Retorna o conteúdo de images/dist/manifest.json, relendo-o se foi alterado desde a
+    última leitura. Se o build ainda não foi executado, retorna um manifest vazio e as
+    imagens originais continuam sendo usadas.
+    """
+    global IMAGES_MANIFEST, IMAGES_MANIFEST_MTIME
+    try:
+        mtime = IMAGES_MANIFEST_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if IMAGES_MANIFEST is not None and mtime == IMAGES_MANIFEST_MTIME:
+        return IMAGES_MANIFEST
+
+    with IMAGES_MANIFEST_LOCK:
+        if IMAGES_MANIFEST is not None and mtime == IMAGES_MANIFEST_MTIME:
+            return IMAGES_MANIFEST
+        if mtime is None:
+            print("[Image Service] AVISO: manifest não encontrado, servindo imagens originais. Rode 'python build_images.py'.")
+            IMAGES_MANIFEST = {}
+        else:
+            try:
+                with open(IMAGES_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                    IMAGES_MANIFEST = json.load(f)
+                print(f"[Image Service] Manifest com {len(IMAGES_MANIFEST)} imagens otimizadas carregado.")
+            except (OSError, ValueError) as e:
+                # Mantém o manifest anterior (ou nenhum) e tenta de novo na próxima chamada
+                print(f"[Image Service] AVISO: não foi possível ler o manifest ({e}).")
+                if IMAGES_MANIFEST is None:
+                    IMAGES_MANIFEST = {}
+                return IMAGES_MANIFEST
+        IMAGES_MANIFEST_MTIME = mtime
+    return IMAGES_MANIFEST
+
+def build_image_urls(image_names: List[str]) -> Tuple[List[str], List[str]]:
+    """Retorna (URLs das imagens completas, URLs das miniaturas) para os nomes informados."""
+    manifest = get_images_manifest()
+    full_urls, thumb_urls = [], []
+    for name in image_names:
+        entry = manifest.get(name)
+        if entry:
+            full_urls.append(f"{PUBLIC_BASE_URL}/static/images/{entry['full']}")
+            thumb_urls.append(f"{PUBLIC_BASE_URL}/static/images/{entry['thumb']}")
+        else:
+            full_urls.append(f"{PUBLIC_BASE_URL}/images/{name}")
+            thumb_urls.append(f"{PUBLIC_BASE_URL}/images/{name}")
+    return full_urls, thumb_urls
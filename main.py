@@ -2,12 +2,13 @@
 import uvicorn
 import os
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importa os módulos do seu projeto
 from routers import chat
 import database
+from config import IMAGES_DIST_PATH, IMAGES_MANIFEST_PATH
+from static_files import CachedStaticFiles, CompressionMiddleware
 
 # Cria a instância da aplicação FastAPI
 app = FastAPI(title="Chatbot ERP Master")
@@ -33,16 +34,28 @@ app.add_middleware(
 )
 # --- FIM DA CONFIGURAÇÃO CORS ---
 
+# Compressão (brotli/gzip) das respostas JSON; arquivos estáticos ficam de fora.
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+
 # --- CONFIGURAÇÃO DE ARQUIVOS ESTÁTICOS ---
 # Define o caminho absoluto para a pasta 'images'
 IMAGES_DIR = os.path.join(os.path.dirname(__file__), "images")
 
 if os.path.exists(IMAGES_DIR):
-    app.mount("/images", StaticFiles(directory=IMAGES_DIR), name="images")
+    # Originais: cache curto (1 hora); depois o navegador revalida com ETag (304)
+    app.mount("/images", CachedStaticFiles(directory=IMAGES_DIR, cache_control="public, max-age=3600"), name="images")
     print(f"📁 Pasta de imagens estáticas configurada em: {IMAGES_DIR}")
 else:
     print(f"⚠️ AVISO: Pasta de imagens '{IMAGES_DIR}' não foi encontrada!")
 
+# Variantes WebP com hash no nome (geradas por build_images.py): cache imutável de 1 ano.
+# A pasta é criada e montada sempre, para que um build feito com a API no ar já seja servido.
+IMAGES_DIST_PATH.mkdir(parents=True, exist_ok=True)
+app.mount("/static/images", CachedStaticFiles(directory=IMAGES_DIST_PATH), name="images_dist")
+print(f"📁 Imagens otimizadas configuradas em: {IMAGES_DIST_PATH}")
+if not IMAGES_MANIFEST_PATH.exists():
+    print("⚠️ AVISO: Imagens otimizadas ainda não geradas. Rode 'python build_images.py' (não é preciso reiniciar a API).")
+
 # --- INCLUSÃO DO ROTEADOR ---
 # Inclui as rotas definidas no arquivo routers/chat.py
 app.include_router(chat.router)
@@ -0,0 +1,265 @@
+# File: message_archive.py
+# Arquivamento de conversas antigas: mantém a tabela `messages` como uma tabela
+# "quente" com apenas a janela de retenção, e move o restante para arquivos
+# JSONL comprimidos (gzip) em disco, um arquivo por lote, agrupados por mês de início
+# da conversa e cliente:
+#
+#   archive/conversations/<AAAA-MM>/client_<id>/<primeiro id>-<último id>.jsonl.gz
+#
+# Cada linha é uma conversa completa com suas mensagens, da mais nova para a mais
+# antiga. Os arquivos nunca recebem append: são gravados em um .tmp e renomeados,
+# então um arquivo visível está sempre completo. As funções de leitura permitem que
+# o dashboard consulte esse histórico quando solicitado.
+#
+# Uso:
+#   python message_archive.py               -> arquiva conversas mais antigas que ARCHIVE_RETENTION_DAYS
+#   python message_archive.py --dias 90     -> usa outra janela de retenção
+import argparse
+import gzip
+import heapq
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Iterator, List, Optional
+from sqlalchemy.orm import Session
+from database import SessionLocal, Conversation, Message, RollupState
+from config import ARCHIVE_PATH, ARCHIVE_RETENTION_DAYS
+from analytics_rollup import STATE_CONVERSATIONS, STATE_MESSAGES
+
+ARCHIVE_BATCH_SIZE = 500
+CONVERSATIONS_DIR = ARCHIVE_PATH / "conversations"
+
+
+# --- Escrita ---
+
+def archive_dir(client_id: int, start_time: datetime):
+    return CONVERSATIONS_DIR / start_time.strftime("%Y-%m") / f"client_{client_id}"
+
+
+def serialize_conversation(conversation: Conversation, messages: List[Message]) -> dict:
+    return {
+        "conversation_id": conversation.conversation_id,
+        "client_id": conversation.client_id,
+        "start_time": conversation.start_time.isoformat(),
+        "messages": [
+            {
+                "message_id": m.message_id,
+                "sender": m.sender,
+                "content": m.content,
+                "timestamp": m.timestamp.isoformat() if m.timestamp else None,
+                "intent_id": m.intent_id,
+                "intent_title": m.intent_title,
+                "match_method": m.match_method,
+                "match_score": m.match_score,
+                "latency_ms": m.latency_ms,
+            }
+            for m in messages
+        ],
+    }
+
+
+def write_archive_records(records: List[dict]):
+    """
+    Grava cada grupo (mês, cliente) do lote em um arquivo próprio: escreve em .tmp,
+    faz fsync e só então renomeia com os.replace (atômico). O nome vem dos IDs das
+    conversas, então repetir um lote interrompido apenas substitui o mesmo arquivo.
+    As linhas ficam em ordem decrescente de conversation_id, a ordem de leitura do dashboard.
+    """
+    by_dir = defaultdict(list)
+    for record in records:
+        by_dir[archive_dir(record["client_id"], datetime.fromisoformat(record["start_time"]))].append(record)
+
+    for directory, dir_records in by_dir.items():
+        directory.mkdir(parents=True, exist_ok=True)
+        ids = [r["conversation_id"] for r in dir_records]
+        path = directory / f"{min(ids)}-{max(ids)}.jsonl.gz"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                for record in sorted(dir_records, key=lambda r: r["conversation_id"], reverse=True):
+                    gz.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def archive_batch(db: Session, cutoff: datetime) -> int:
+    """
+    Arquiva um lote de conversas sem nenhuma mensagem desde `cutoff`.
+    Só arquiva mensagens já agregadas pelos rollups, para não perder estatísticas.
+    Retorna quantas conversas foram movidas.
+    """
+    states = {s.name: s.last_id for s in db.query(RollupState).filter(RollupState.name.in_([STATE_CONVERSATIONS, STATE_MESSAGES]))}
+    conversations_rolled_up_until = states.get(STATE_CONVERSATIONS, 0)
+    messages_rolled_up_until = states.get(STATE_MESSAGES, 0)
+
+    recent_message = db.query(Message.message_id).filter(
+        Message.conversation_id == Conversation.conversation_id,
+        (Message.timestamp >= cutoff) | (Message.message_id > messages_rolled_up_until)
+    ).exists()
+    conversations = db.query(Conversation)\
+        .filter(
+            Conversation.start_time < cutoff,
+            Conversation.conversation_id <= conversations_rolled_up_until,
+            ~recent_message
+        )\
+        .order_by(Conversation.conversation_id.asc())\
+        .limit(ARCHIVE_BATCH_SIZE)\
+        .all()
+    if not conversations:
+        return 0
+
+    conversation_ids = [c.conversation_id for c in conversations]
+    messages_by_conversation = defaultdict(list)
+    for message in db.query(Message)\
+            .filter(Message.conversation_id.in_(conversation_ids))\
+            .order_by(Message.conversation_id, Message.timestamp.asc(), Message.message_id.asc()):
+        messages_by_conversation[message.conversation_id].append(message)
+
+    records = [serialize_conversation(c, messages_by_conversation[c.conversation_id]) for c in conversations]
+
+    # Primeiro grava em disco (com fsync), depois apaga do banco. Se o processo cair
+    # durante a gravação sobra só um .tmp (ignorado pelo leitor); se cair entre as duas
+    # etapas, a próxima execução regrava o lote e o leitor descarta duplicatas.
+    write_archive_records(records)
+    try:
+        db.query(Message).filter(Message.conversation_id.in_(conversation_ids)).delete(synchronize_session=False)
+        db.query(Conversation).filter(Conversation.conversation_id.in_(conversation_ids)).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(conversations)
+
+
+def archive_old_conversations(db: Session, retention_days: int = ARCHIVE_RETENTION_DAYS) -> int:
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    total = 0
+    while True:
+        moved = archive_batch(db, cutoff)
+        total += moved
+        if moved < ARCHIVE_BATCH_SIZE:
+            break
+    return total
+
+
+# --- Leitura ---
+
+def iter_archive_file(path) -> Iterator[dict]:
+    """
+    Lê um arquivo de lote linha a linha. Se o arquivo estiver corrompido, avisa e
+    encerra a leitura dele (as linhas anteriores ao erro já foram entregues).
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (OSError, EOFError, zlib.error, ValueError) as e:
+        print(f"⚠️ AVISO: arquivo de histórico corrompido ignorado: {path} ({e})")
+
+
+def iter_client_month(client_dir) -> Iterator[dict]:
+    """
+    Intercala os arquivos de um mês/cliente em ordem decrescente de conversation_id.
+    Os arquivos são abertos do maior para o menor último ID, e um arquivo só é aberto
+    quando pode conter um ID maior que o próximo registro pendente. Assim a memória
+    fica em um registro por arquivo aberto, e quem para de consumir cedo não lê o resto.
+    """
+    files = []
+    for path in client_dir.glob("*.jsonl.gz"):
+        try:
+            _, last_id = (int(part) for part in path.name[:-len(".jsonl.gz")].split("-"))
+        except ValueError:
+            print(f"⚠️ AVISO: arquivo de histórico com nome inesperado ignorado: {path}")
+            continue
+        files.append((last_id, path))
+    files.sort(reverse=True)
+
+    heap = [] # (-conversation_id, índice do arquivo, registro, leitor)
+    def push_next(index: int, reader: Iterator[dict]):
+        record = next(reader, None)
+        if record is not None:
+            heapq.heappush(heap, (-record["conversation_id"], index, record, reader))
+
+    next_file = 0
+    while heap or next_file < len(files):
+        while next_file < len(files) and (not heap or files[next_file][0] >= -heap[0][0]):
+            push_next(next_file, iter_archive_file(files[next_file][1]))
+            next_file += 1
+        if not heap:
+            continue
+        _, index, record, reader = heapq.heappop(heap)
+        yield record
+        push_next(index, reader)
+
+
+def iter_archived_conversations(client_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None, text: Optional[str] = None) -> Iterator[dict]:
+    """
+    Percorre as conversas arquivadas do cliente, das mais recentes para as mais antigas
+    (mês a mês, e dentro do mês por conversation_id decrescente), lendo os arquivos
+    linha a linha e só os meses do intervalo pedido, quando informado.
+    """
+    if not CONVERSATIONS_DIR.exists():
+        return
+    month_from = date_from.strftime("%Y-%m") if date_from else None
+    month_to = date_to.strftime("%Y-%m") if date_to else None
+    text_lower = text.lower() if text else None
+
+    for month_dir in sorted(CONVERSATIONS_DIR.iterdir(), reverse=True):
+        if (month_from and month_dir.name < month_from) or (month_to and month_dir.name > month_to):
+            continue
+        client_dir = month_dir / f"client_{client_id}"
+        if not client_dir.is_dir():
+            continue
+
+        # Um lote regravado após uma queda pode repetir conversas em outro arquivo;
+        # como a leitura é ordenada por ID, as duplicatas chegam em sequência.
+        last_id = None
+        for record in iter_client_month(client_dir):
+            if record["conversation_id"] == last_id:
+                continue
+            last_id = record["conversation_id"]
+            start_day = datetime.fromisoformat(record["start_time"]).date()
+            if date_from and start_day < date_from:
+                continue
+            if date_to and start_day > date_to:
+                continue
+            if text_lower and not any(text_lower in m["content"].lower() for m in record["messages"]):
+                continue
+            yield record
+
+
+def get_archived_conversations(client_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None, text: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """Retorna no máximo `limit` conversas arquivadas que atendem aos filtros."""
+    results = []
+    for record in iter_archived_conversations(client_id, date_from, date_to, text):
+        results.append(record)
+        if len(results) >= limit:
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move conversas antigas do banco para o arquivo comprimido em disco.")
+    parser.add_argument("--dias", type=int, default=ARCHIVE_RETENTION_DAYS, help="Janela de retenção no banco, em dias.")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = archive_old_conversations(db, args.dias)
+        print(f"[Arquivo] {total} conversas com mais de {args.dias} dias movidas para '{CONVERSATIONS_DIR}'.")
+    except Exception as e:
+        print(f"❌ Erro ao arquivar conversas: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
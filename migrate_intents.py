@@ -3,7 +3,7 @@ import json
 import sys
 import os
 from sqlalchemy.orm import Session
-from database import SessionLocal, Intent, IntentVariation, engine, Base # Seus módulos database.py
+from database import SessionLocal, Intent, IntentVariation, IntentSignature, engine, Base # Seus módulos database.py
 
 def load_json_intents(file_path: str) -> dict:
     """Carrega o arquivo JSON com as intenções"""
@@ -22,7 +22,10 @@ def clear_existing_intents(db: Session):
     """Remove todas as intenções e variações existentes. Levanta exceção em caso de falha."""
     print("🧹 Iniciando limpeza de intenções e variações existentes...")
     try:
-        # Deletar variações primeiro por causa da dependência da chave estrangeira
+        # Deletar variações e assinaturas primeiro por causa da dependência da chave estrangeira
+        num_signatures_deleted = db.query(IntentSignature).delete(synchronize_session=False)
+        print(f"  - {num_signatures_deleted} assinaturas de erro marcadas para deleção.")
+
         num_variations_deleted = db.query(IntentVariation).delete(synchronize_session=False)
         print(f"  - {num_variations_deleted} variações de intenção marcadas para deleção.")
         
@@ -120,6 +123,14 @@ def migrate_intents_to_database(json_data: dict, db: Session, clear_all_data_bef
                     db.commit()
                 print(f"  	📝 {current_intent_patterns_added} padrões/variações adicionados para '{intent_key}'.")
                 patterns_added_count += current_intent_patterns_added
+
+            # Assinaturas de erro: trechos literais, gravados sem normalização (o error_matcher normaliza)
+            signatures = [sig.strip() for sig in intent_data.get('signatures', []) if sig.strip()]
+            if signatures:
+                for signature in signatures:
+                    db.add(IntentSignature(intent_id=db_intent.intent_id, signature=signature))
+                db.commit()
+                print(f"  	🔎 {len(signatures)} assinaturas de erro adicionadas para '{intent_key}'.")
             
         except Exception as e:
             print(f"  ❌ Erro ao processar/adicionar a intenção '{intent_key}': {e}")
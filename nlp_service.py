@@ -2,9 +2,10 @@
 import spacy
 from fuzzywuzzy import fuzz
 from sqlalchemy.orm import Session
-from typing import Optional, Tuple
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 from database import Intent, IntentVariation
 import re
+from config import NLP_MAX_QUESTION_CHARS
 
 # A variável global para o modelo começa como None.
 NLP_MODEL = None
@@ -28,37 +29,62 @@ def get_nlp_model():
             print("[NLP Service] Modelo baixado e carregado com sucesso.")
     return NLP_MODEL
 
+def _doc_to_text(doc) -> str:
+    tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct and token.text.strip()]
+    return " ".join(tokens)
+
 def preprocess_text(text: str) -> str:
     """Limpa e normaliza o texto: remove stopwords, pontuação e aplica lematização."""
     nlp = get_nlp_model() # Pega o modelo (carrega apenas se for a 1ª vez)
-    doc = nlp(text.lower())
-    tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct and token.text.strip()]
-    return " ".join(tokens)
+    return _doc_to_text(nlp(text.lower()))
+
+def preprocess_texts(texts: Iterable[str]) -> List[str]:
+    """Mesmo que preprocess_text, mas em lote com nlp.pipe (bem mais rápido para muitos textos)."""
+    nlp = get_nlp_model()
+    return [_doc_to_text(doc) for doc in nlp.pipe(text.lower() for text in texts)]
+
+def find_best_candidate(preprocessed_question: str, candidates: Iterable[Tuple[Any, str]], scorer: Callable[[str, str], int] = fuzz.token_sort_ratio) -> Tuple[Optional[Any], int]:
+    """
+    Compara a pergunta já pré-processada com cada (chave, variação pré-processada)
+    e retorna a chave de maior score. Usada pelo chat e pelo replay_harness.py.
+    """
+    best_score = 0
+    best_key = None
+
+    for key, preprocessed_variation in candidates:
+        if not preprocessed_variation:
+            continue
+        score = scorer(preprocessed_question, preprocessed_variation)
+        if score > best_score:
+            best_score = score
+            best_key = key
+
+    return best_key, best_score
+
+def truncate_for_nlp(text: str, max_chars: int = NLP_MAX_QUESTION_CHARS) -> str:
+    """
+    Limita o texto enviado ao spaCy/fuzzywuzzy, cujo custo cresce com o tamanho.
+    Mantém o começo (onde costuma estar o essencial de um erro colado) e corta
+    no último espaço para não partir uma palavra ao meio.
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    last_space = cut.rfind(" ")
+    return cut[:last_space] if last_space > max_chars // 2 else cut
 
 def find_best_intent_nlp(db: Session, question: str) -> Tuple[Optional[Intent], int]:
     """Usa PLN para encontrar a melhor intenção para a pergunta no banco de dados."""
     if not question:
         return None, 0
 
-    preprocessed_question = preprocess_text(question)
+    preprocessed_question = preprocess_text(truncate_for_nlp(question))
     if not preprocessed_question:
         return None, 0
 
     variations = db.query(IntentVariation).all()
-    
-    best_score = 0
-    best_intent = None
-
-    for variation in variations:
-        preprocessed_variation = preprocess_text(variation.variation)
-        if not preprocessed_variation:
-            continue
-        score = fuzz.token_sort_ratio(preprocessed_question, preprocessed_variation)
-        if score > best_score:
-            best_score = score
-            best_intent = variation.intent
-
-    return best_intent, best_score
+    candidates = ((variation.intent, preprocess_text(variation.variation)) for variation in variations)
+    return find_best_candidate(preprocessed_question, candidates)
 
 def extract_order_code(text: str) -> Optional[str]:
     """
@@ -0,0 +1,277 @@
+# File: replay_harness.py
+# Reexecuta perguntas reais (do banco ou de um arquivo exportado) no matcher do chat,
+# em paralelo em todos os núcleos, e compara limiares e estratégias de similaridade.
+#
+# Para cada combinação estratégia x limiar o relatório mostra a taxa de fallback,
+# as intenções mais acionadas e quantas respostas mudam em relação às registradas
+# em messages.intent_title/match_method. Também mede a vazão (perguntas/segundo), então
+# serve como teste de performance offline do matcher.
+#
+# Uso:
+#   python replay_harness.py                                  -> últimas 5000 perguntas do banco, catálogo do banco
+#   python replay_harness.py --catalogo json                  -> testa o catálogo de intents_sources/ antes de migrar
+#   python replay_harness.py --arquivo perguntas.jsonl        -> perguntas exportadas ({"question": ..., "intent": ...} por linha, ou .txt)
+#   python replay_harness.py --limiares 50,60,70 --processos 4 --saida relatorio.json
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from multiprocessing import Barrier, Pool
+from typing import Dict, List, Optional, Tuple
+from fuzzywuzzy import fuzz
+from config import CONFIDENCE_THRESHOLD
+from nlp_service import preprocess_text, preprocess_texts, truncate_for_nlp, find_best_candidate, get_nlp_model
+from error_matcher import ErrorSignatureMatcher
+
+STRATEGIES = {
+    "token_sort_ratio": fuzz.token_sort_ratio, # a usada em produção
+    "token_set_ratio": fuzz.token_set_ratio,
+    "partial_token_sort_ratio": fuzz.partial_token_sort_ratio,
+    "WRatio": fuzz.WRatio,
+}
+PRODUCTION_STRATEGY = "token_sort_ratio"
+DEFAULT_THRESHOLDS = [50, 55, 60, 65, 70, 75, 80, 85, 90]
+INTENTS_DIRECTORY = "intents_sources"
+
+# --- Carga do catálogo e das perguntas ---
+
+def load_catalogue_from_db() -> List[Tuple[str, str]]:
+    """Retorna (título da intenção, variação) de todas as variações do banco."""
+    from database import SessionLocal, Intent, IntentVariation
+    db = SessionLocal()
+    try:
+        rows = db.query(Intent.title, IntentVariation.variation)\
+            .join(IntentVariation, IntentVariation.intent_id == Intent.intent_id)\
+            .all()
+        return [(title, variation) for title, variation in rows]
+    finally:
+        db.close()
+
+def load_catalogue_from_json(directory: str = INTENTS_DIRECTORY) -> List[Tuple[str, str]]:
+    """Lê o catálogo direto dos JSON (mesma normalização do migrate_intents.py)."""
+    from migrate_intents import load_json_intents
+    aggregated = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(".json"):
+            aggregated.update(load_json_intents(os.path.join(directory, filename)))
+    return [
+        (title, pattern.lower().strip())
+        for title, data in aggregated.items()
+        for pattern in data.get("patterns", [])
+        if pattern.strip()
+    ]
+
+def load_signatures_from_db() -> List[Tuple[str, str]]:
+    """Retorna (título da intenção, assinatura de erro) da tabela intent_signatures."""
+    from database import SessionLocal, Intent, IntentSignature
+    db = SessionLocal()
+    try:
+        rows = db.query(Intent.title, IntentSignature.signature)\
+            .join(IntentSignature, IntentSignature.intent_id == Intent.intent_id)\
+            .all()
+        return [(title, signature) for title, signature in rows]
+    finally:
+        db.close()
+
+def load_signatures_from_json(directory: str = INTENTS_DIRECTORY) -> List[Tuple[str, str]]:
+    """Lê as chaves "signatures" dos JSON."""
+    from migrate_intents import load_json_intents
+    aggregated = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(".json"):
+            aggregated.update(load_json_intents(os.path.join(directory, filename)))
+    return [
+        (title, signature.strip())
+        for title, data in aggregated.items()
+        for signature in data.get("signatures", [])
+        if signature.strip()
+    ]
+
+def load_questions_from_db(limit: int) -> List[dict]:
+    """
+    Retorna as perguntas mais recentes do banco com a intenção que foi registrada
+    na resposta do bot logo em seguida (None = fallback, ausente = sem registro).
+    """
+    from database import SessionLocal, Message
+    db = SessionLocal()
+    try:
+        # Lê do fim para o começo: cada resposta do bot é vista antes da pergunta que a originou.
+        rows = db.query(Message.conversation_id, Message.sender, Message.content, Message.intent_title, Message.match_method)\
+            .order_by(Message.message_id.desc())\
+            .yield_per(1000)
+
+        questions = []
+        pending_answer = {} # conversation_id -> resposta do bot ainda sem pergunta
+        for conversation_id, sender, content, intent_title, match_method in rows:
+            if sender == 'bot':
+                pending_answer[conversation_id] = (intent_title, match_method)
+                continue
+            question = {"question": content}
+            answer = pending_answer.pop(conversation_id, None)
+            # Usa o título gravado na própria mensagem (sobrevive à recarga do catálogo);
+            # respostas sem registro de método ou título ficam fora da comparação.
+            if answer and answer[1] == 'fallback':
+                question["intent"] = None
+            elif answer and answer[1] is not None and answer[0] is not None:
+                question["intent"] = answer[0]
+            questions.append(question)
+            if len(questions) >= limit:
+                break
+        questions.reverse()
+        return questions
+    finally:
+        db.close()
+
+def load_questions_from_file(path: str, limit: int) -> List[dict]:
+    """Aceita .jsonl ({"question": ..., "intent": ...}) ou texto puro com uma pergunta por linha."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line) if path.lower().endswith(".jsonl") else {"question": line})
+            if len(questions) >= limit:
+                break
+    return questions
+
+# --- Worker (um por processo) ---
+
+_exact_index: Dict[str, str] = {}
+_candidates: List[Tuple[str, str]] = []
+_strategies: List[str] = []
+_signature_matcher: Optional[ErrorSignatureMatcher] = None
+_ready: Optional[Barrier] = None
+
+def init_worker(exact_index: Dict[str, str], candidates: List[Tuple[str, str]], strategies: List[str], signatures: List[Tuple[str, str]], ready: Barrier):
+    global _exact_index, _candidates, _strategies, _signature_matcher, _ready
+    _exact_index = exact_index
+    _candidates = candidates
+    _strategies = strategies
+    _signature_matcher = ErrorSignatureMatcher(signatures)
+    _ready = ready
+    get_nlp_model() # carrega o spaCy uma vez por processo
+
+def wait_ready(_) -> int:
+    """
+    Tarefa de aquecimento: cada worker fica preso na barreira até todos terem passado
+    pelo init_worker, então um map com uma tarefa por processo só termina com o pool pronto.
+    """
+    _ready.wait()
+    return os.getpid()
+
+def match_question(question: str) -> Tuple[Optional[str], Dict[str, Tuple[Optional[str], int]]]:
+    """
+    Retorna (intenção do match exato ou por assinatura de erro, {estratégia: (melhor intenção, score)}),
+    na mesma ordem do chat. O score não depende do limiar, então um único passe atende a todos os limiares.
+    """
+    exact = _exact_index.get(question.lower().strip()) or _signature_matcher.match(question)
+    if exact:
+        return exact, {}
+    preprocessed_question = preprocess_text(truncate_for_nlp(question)) if question else ""
+    if not preprocessed_question:
+        return None, {name: (None, 0) for name in _strategies}
+    return None, {name: find_best_candidate(preprocessed_question, _candidates, STRATEGIES[name]) for name in _strategies}
+
+# --- Relatório ---
+
+def build_report(questions: List[dict], results: list, strategies: List[str], thresholds: List[int]) -> dict:
+    report = {}
+    for name in strategies:
+        for threshold in thresholds:
+            answers = []
+            for exact, scored in results:
+                if exact:
+                    answers.append(exact)
+                else:
+                    intent, score = scored[name]
+                    answers.append(intent if intent and score >= threshold else None)
+
+            compared = [(q["intent"], a) for q, a in zip(questions, answers) if "intent" in q]
+            report[f"{name}@{threshold}"] = {
+                "strategy": name,
+                "threshold": threshold,
+                "fallback_rate": sum(1 for a in answers if a is None) / len(answers) if answers else 0,
+                "compared_with_log": len(compared),
+                "changed_answers": sum(1 for logged, replayed in compared if logged != replayed),
+                "top_intents": Counter(a for a in answers if a).most_common(10),
+            }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de perguntas reais no matcher, com varredura de limiares e estratégias.")
+    parser.add_argument("--arquivo", help="Arquivo .jsonl ou .txt com perguntas exportadas (padrão: mensagens do banco).")
+    parser.add_argument("--catalogo", choices=["banco", "json"], default="banco", help="Origem das intenções.")
+    parser.add_argument("--limite", type=int, default=5000, help="Número máximo de perguntas.")
+    parser.add_argument("--limiares", default=",".join(str(t) for t in DEFAULT_THRESHOLDS), help="Lista separada por vírgulas.")
+    parser.add_argument("--estrategias", default=",".join(STRATEGIES), help=f"Subconjunto de: {', '.join(STRATEGIES)}.")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="Processos do pool (padrão: todos os núcleos).")
+    parser.add_argument("--saida", help="Grava o relatório completo em JSON neste caminho.")
+    args = parser.parse_args()
+
+    thresholds = sorted({int(t) for t in args.limiares.split(",") if t.strip()})
+    strategies = [s.strip() for s in args.estrategias.split(",") if s.strip()]
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        parser.error(f"Estratégias desconhecidas: {', '.join(unknown)}")
+
+    catalogue = load_catalogue_from_json() if args.catalogo == "json" else load_catalogue_from_db()
+    signatures = load_signatures_from_json() if args.catalogo == "json" else load_signatures_from_db()
+    questions = load_questions_from_file(args.arquivo, args.limite) if args.arquivo else load_questions_from_db(args.limite)
+    if not catalogue or not questions:
+        print("❌ Catálogo ou lista de perguntas vazia. Nada para reexecutar.")
+        return
+    print(f"📚 {len(catalogue)} variações no catálogo ({args.catalogo}), {len(questions)} perguntas para reexecutar.")
+
+    # As variações são pré-processadas uma única vez aqui e enviadas prontas aos workers.
+    started = time.perf_counter()
+    exact_index = {}
+    for title, variation in catalogue:
+        exact_index.setdefault(variation.lower().strip(), title)
+    candidates = list(zip((title for title, _ in catalogue), preprocess_texts(v for _, v in catalogue)))
+    print(f"⚙️  Catálogo pré-processado em {time.perf_counter() - started:.2f}s.")
+
+    # A subida do pool (no Windows, um spaCy carregado por processo) é medida à parte,
+    # para não entrar na vazão do matcher.
+    started = time.perf_counter()
+    ready = Barrier(args.processos)
+    with Pool(processes=args.processos, initializer=init_worker, initargs=(exact_index, candidates, strategies, signatures, ready)) as pool:
+        pool.map(wait_ready, range(args.processos), chunksize=1)
+        startup = time.perf_counter() - started
+        print(f"⚙️  Pool com {args.processos} processos pronto em {startup:.2f}s.")
+
+        started = time.perf_counter()
+        results = pool.map(match_question, [q["question"] for q in questions], chunksize=max(1, len(questions) // (args.processos * 8)))
+        elapsed = time.perf_counter() - started
+
+    report = build_report(questions, results, strategies, thresholds)
+
+    print(f"\n🚀 {len(questions)} perguntas em {elapsed:.2f}s com {args.processos} processos "
+          f"→ {len(questions) / elapsed:.1f} perguntas/s ({len(strategies)} estratégias por pergunta).")
+    print(f"\n{'Configuração':<36}{'Fallback':>10}{'Mudanças':>16}")
+    for key, entry in report.items():
+        marker = "  ← produção" if entry["strategy"] == PRODUCTION_STRATEGY and entry["threshold"] == CONFIDENCE_THRESHOLD else ""
+        print(f"{key:<36}{entry['fallback_rate'] * 100:>9.1f}%{entry['changed_answers']:>8}/{entry['compared_with_log']:<7}{marker}")
+
+    production_key = f"{PRODUCTION_STRATEGY}@{CONFIDENCE_THRESHOLD}"
+    if production_key in report:
+        print(f"\n📊 Intenções mais acionadas ({production_key}):")
+        for title, hits in report[production_key]["top_intents"]:
+            print(f"   - {title}: {hits}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({
+                "questions": len(questions),
+                "processes": args.processos,
+                "pool_startup_seconds": startup,
+                "elapsed_seconds": elapsed,
+                "questions_per_second": len(questions) / elapsed,
+                "configurations": report,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Relatório gravado em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
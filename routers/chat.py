@@ -1,17 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
 from models import ChatMessage
-from database import get_db, Client, Conversation, Message as DB_Message, Intent, IntentVariation
+from database import SessionLocal, Client, Conversation, Message as DB_Message, Intent, IntentVariation
 import re
+import secrets
 import random
 import json
+import time
+from functools import partial
+import anyio
 
 from nlp_service import find_best_intent_nlp, extract_order_code
+from error_matcher import find_error_signature_intent
 from api_service import consultar_status_api
+from image_service import build_image_urls
+from admission_control import admission
+from config import FALLBACK_RESPONSE, CONFIDENCE_THRESHOLD, ADMIN_TOKEN
 
-CONFIDENCE_THRESHOLD = 60
 router = APIRouter()
 
 # --- Funções de suporte (sem alterações) ---
@@ -20,7 +28,9 @@ def get_client_by_token(db: Session, token: str) -> Client:
         raise HTTPException(status_code=403, detail="Token de acesso não fornecido.")
     client = db.query(Client).filter(Client.access_token == token).first()
     if not client:
+        admission.forget_client(token)
         raise HTTPException(status_code=403, detail="Token de acesso inválido ou não autorizado.")
+    admission.remember_client(token, client.client_id) # permite aplicar o limite por cliente no event loop
     return client
 
 def get_or_create_conversation(db: Session, client_id: int) -> Conversation:
@@ -45,9 +55,41 @@ def find_exact_match(db: Session, message: str) -> Optional[Intent]:
 
 # --- Endpoint Principal do Chat ---
 @router.post("/chat")
-async def chat(api_message: ChatMessage, db: Session = Depends(get_db)):
+async def chat(api_message: ChatMessage):
+    """
+    A admissão roda no event loop, antes de a requisição ocupar uma thread: assim o
+    contador global inclui as requisições esperando thread livre e o 503 sai sem nenhum
+    trabalho de PLN ou banco. Se o token já está no cache, o limite do cliente é aplicado
+    antes do global, para que um cliente em rajada não esgote as vagas dos demais.
+    O processamento (síncrono) vai para o threadpool.
+    """
+    request_started = time.perf_counter()
+    cached_client_id = admission.cached_client_id(api_message.token) if api_message.token else None
+    if cached_client_id is not None:
+        admission.acquire_client(cached_client_id) # 429 se o cliente excedeu taxa ou concorrência
+    try:
+        admission.acquire_global()
+        try:
+            return await run_in_threadpool(process_chat_message, api_message, request_started, cached_client_id)
+        finally:
+            admission.release_global()
+    finally:
+        if cached_client_id is not None:
+            admission.release_client(cached_client_id)
+
+def process_chat_message(api_message: ChatMessage, request_started: float, admitted_client_id: Optional[int] = None) -> dict:
+    """
+    Processa a pergunta em uma thread do pool (banco e spaCy são bloqueantes).
+    `admitted_client_id` é o cliente já admitido no event loop pelo cache de tokens;
+    sem ele, o limite por cliente é aplicado aqui, depois de validar o token.
+    """
+    db = SessionLocal()
+    thread_client_id = None
     try:
         client = get_client_by_token(db, api_message.token)
+        if client.client_id != admitted_client_id:
+            admission.acquire_client(client.client_id) # 429 se o cliente excedeu taxa ou concorrência
+            thread_client_id = client.client_id
         conversation = get_or_create_conversation(db, client.client_id)
         
         user_msg = DB_Message(conversation_id=conversation.conversation_id, sender="user", content=api_message.question)
@@ -56,8 +98,17 @@ async def chat(api_message: ChatMessage, db: Session = Depends(get_db)):
         db.refresh(user_msg)
         print(f"\n--- Nova Mensagem ---\nCliente: '{client.client_name}'\nPergunta: '{api_message.question}'")
 
+        match_method = "exact"
+        score = 100
         found_intent = find_exact_match(db, api_message.question)
         if not found_intent:
+            # Caminho rápido: assinatura de erro conhecida colada na pergunta (Aho-Corasick, tempo linear).
+            # Não há score de similaridade nesse caso, então match_score fica NULL.
+            match_method = "signature"
+            score = None
+            found_intent = find_error_signature_intent(db, api_message.question)
+        if not found_intent:
+            match_method = "nlp"
             found_intent, score = find_best_intent_nlp(db, api_message.question)
             if not found_intent or score < CONFIDENCE_THRESHOLD:
                 found_intent = None
@@ -72,13 +123,16 @@ async def chat(api_message: ChatMessage, db: Session = Depends(get_db)):
             # <<< LÓGICA FINAL E CORRIGIDA >>>
             # Primeiro, trata a intenção especial de status de pedido
             if found_intent.title == 'processo_status_pedido':
+                match_method = "status"
                 codigo_extraido = extract_order_code(api_message.question)
                 
                 if codigo_extraido:
                     if client.master_api_token and client.master_api_url:
-                        api_response = await consultar_status_api(
+                        # Estamos em uma thread do pool: a chamada assíncrona roda no event loop
+                        api_response = anyio.from_thread.run(partial(
+                            consultar_status_api,
                             codigo_venda=codigo_extraido, token=client.master_api_token, base_url=client.master_api_url
-                        )
+                        ))
                         if api_response and 'venda' in api_response and api_response['venda']:
                             status_pedido = api_response['venda'][0].get("DescricaoStatus", "Status não informado")
                             bot_response_text_final = f"O status do seu pedido {codigo_extraido} é: {status_pedido}."
@@ -123,22 +177,46 @@ async def chat(api_message: ChatMessage, db: Session = Depends(get_db)):
                     bot_response_text_final = response_full_text
 
         else:
-            bot_response_text_final = "Desculpe, não tenho certeza de como ajudar."
+            match_method = "fallback"
+            bot_response_text_final = FALLBACK_RESPONSE
         
         # Etapa final: Salvar e retornar
         print(f"Resposta do Bot: '{bot_response_text_final}'")
-        bot_msg = DB_Message(conversation_id=conversation.conversation_id, sender="bot", content=bot_response_text_final)
+        latency_ms = int((time.perf_counter() - request_started) * 1000)
+        bot_msg = DB_Message(
+            conversation_id=conversation.conversation_id, sender="bot", content=bot_response_text_final,
+            intent_id=found_intent.intent_id if found_intent else None,
+            intent_title=found_intent.title if found_intent else None,
+            match_method=match_method, match_score=score, latency_ms=latency_ms
+        )
         db.add(bot_msg)
         db.commit()
         db.refresh(bot_msg)
 
         response_payload = { "status": "success", "response": bot_response_text_final, "conversation_id": conversation.conversation_id, "message_id": bot_msg.message_id, "quick_replies": quick_replies_data }
         if image_names:
-            response_payload["images"] = [f"http://localhost:8000/images/{name}" for name in image_names]
+            response_payload["images"], response_payload["image_thumbnails"] = build_image_urls(image_names)
             
         return response_payload
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Ocorreu um erro interno: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ocorreu um erro interno: {str(e)}")
+    finally:
+        if thread_client_id is not None:
+            admission.release_client(thread_client_id)
+        db.close()
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+
+@router.get("/chat/admission-stats", dependencies=[Depends(require_admin_token)])
+def admission_stats():
+    """Contadores do controle de admissão (admitidas e rejeitadas por client_id). Exige X-Admin-Token."""
+    return admission.snapshot()
\ No newline at end of file
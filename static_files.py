@@ -0,0 +1,60 @@
+# File: static_files.py
+import re
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+
+# Nomes gerados pelo build_images.py: <nome>.<hash de 12 hex>[.thumb].webp
+HASHED_NAME_PATTERN = re.compile(r"\.([0-9a-f]{12})(?:\.thumb)?\.\w+$")
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles com cabeçalhos de cache. Arquivos com hash de conteúdo no nome recebem
+    um ETag forte (o próprio hash) e cache "immutable" de 1 ano; os demais usam o
+    ETag padrão do Starlette com o Cache-Control informado.
+    """
+
+    def __init__(self, *args, cache_control: str = "no-cache", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        hashed = HASHED_NAME_PATTERN.search(str(full_path))
+        if hashed:
+            response.headers["etag"] = f'"{hashed.group(1)}"'
+            response.headers["cache-control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["cache-control"] = self.cache_control
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Comprime as respostas da API (JSON) com brotli, ou gzip se o pacote brotli-asgi
+    não estiver instalado. Caminhos de arquivos estáticos ficam de fora, pois
+    imagens WebP/PNG já são comprimidas.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, skip_prefixes=("/images", "/static")):
+        self.app = app
+        self.skip_prefixes = tuple(skip_prefixes)
+        try:
+            from brotli_asgi import BrotliMiddleware
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        except ImportError:
+            print("⚠️ AVISO: pacote 'brotli-asgi' não instalado, usando apenas gzip.")
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(self.skip_prefixes):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)